@@ -1,6 +1,22 @@
-from sys import stderr
-from time import monotonic, sleep
+from bisect import bisect_right
+from functools import lru_cache
+from sys import stderr, stdout
+from time import monotonic, perf_counter, sleep
+from types import MappingProxyType
 import argparse
+import hashlib
+import os
+import pickle
+import re
+import stat
+import struct
+
+try:
+    import termios
+    from fcntl import ioctl
+    from select import select
+except ImportError:
+    termios = None
 
 try:
     from colorama import Fore, Back, init
@@ -39,6 +55,32 @@ BACK_COLOR_MAP = (Back.BLACK, Back.RED, Back.GREEN, Back.YELLOW, Back.BLUE,
                   Back.MAGENTA, Back.CYAN, Back.WHITE, "", Back.RESET, "", "",
                   "", Back.LIGHTYELLOW_EX)
 
+# bounds of the East Asian wide and fullwidth ranges, alternating between
+# the first code point of a range and the first one after it
+WIDE_CHAR_BOUNDS = (
+    0x1100, 0x1160, 0x231A, 0x231C, 0x2329, 0x232B, 0x23E9, 0x23ED,
+    0x23F0, 0x23F1, 0x23F3, 0x23F4, 0x25FD, 0x25FF, 0x2614, 0x2616,
+    0x2648, 0x2654, 0x267F, 0x2680, 0x2693, 0x2694, 0x26A1, 0x26A2,
+    0x26AA, 0x26AC, 0x26BD, 0x26BF, 0x26C4, 0x26C6, 0x26CE, 0x26CF,
+    0x26D4, 0x26D5, 0x26EA, 0x26EB, 0x26F2, 0x26F4, 0x26F5, 0x26F6,
+    0x26FA, 0x26FB, 0x26FD, 0x26FE, 0x2705, 0x2706, 0x270A, 0x270C,
+    0x2728, 0x2729, 0x274C, 0x274D, 0x274E, 0x274F, 0x2753, 0x2756,
+    0x2757, 0x2758, 0x2795, 0x2798, 0x27B0, 0x27B1, 0x27BF, 0x27C0,
+    0x2B1B, 0x2B1D, 0x2B50, 0x2B51, 0x2B55, 0x2B56, 0x2E80, 0x303F,
+    0x3041, 0x3248, 0x3250, 0x4DC0, 0x4E00, 0xA4C7, 0xA960, 0xA97D,
+    0xAC00, 0xD7A4, 0xF900, 0xFADA, 0xFE10, 0xFE1A, 0xFE30, 0xFE6C,
+    0xFF01, 0xFF61, 0xFFE0, 0xFFE7, 0x16FE0, 0x1B2FC, 0x1F004, 0x1F005,
+    0x1F0CF, 0x1F0D0, 0x1F18E, 0x1F18F, 0x1F191, 0x1F19B, 0x1F200, 0x1F321,
+    0x1F32D, 0x1F336, 0x1F337, 0x1F37D, 0x1F37E, 0x1F394, 0x1F3A0, 0x1F3CB,
+    0x1F3CF, 0x1F3D4, 0x1F3E0, 0x1F3F1, 0x1F3F4, 0x1F3F5, 0x1F3F8, 0x1F43F,
+    0x1F440, 0x1F441, 0x1F442, 0x1F4FD, 0x1F4FF, 0x1F53E, 0x1F54B, 0x1F54F,
+    0x1F550, 0x1F568, 0x1F57A, 0x1F57B, 0x1F595, 0x1F597, 0x1F5A4, 0x1F5A5,
+    0x1F5FB, 0x1F650, 0x1F680, 0x1F6C6, 0x1F6CC, 0x1F6CD, 0x1F6D0, 0x1F6D3,
+    0x1F6D5, 0x1F6E0, 0x1F6EB, 0x1F6ED, 0x1F6F4, 0x1F6FD, 0x1F7E0, 0x1F7F1,
+    0x1F90C, 0x1F93B, 0x1F93C, 0x1F946, 0x1F947, 0x1FA00, 0x1FA70, 0x1FAF7,
+    0x20000, 0x3FFFE
+)
+
 
 class FrameUnit:
     def __init__(self, char=" ", fore=9, back=9):
@@ -50,18 +92,173 @@ class FrameUnit:
         return type(self)(self.char, self.fore, self.back)
 
 
+class Viewport:
+    def __init__(self, rows, left, width):
+        self.rows = frozenset(rows)
+        self.left = left
+        self.span = width - left
+        self.offset = 0
+
+    def copy(self):
+        copied = type(self)(self.rows, self.left, self.left + self.span)
+        copied.offset = self.offset
+        return copied
+
+
 class Frame:
     WIDTH = 79
     HEIGHT = 24
+    # the right half of a wide character, which takes no output of its own
+    CONTINUATION = "\0"
 
     def __init__(self):
         self.units = [[FrameUnit() for _ in range(self.WIDTH)]
                       for _ in range(self.HEIGHT)]
+        # encoded rows keyed by the SGR state they start with, and the raw
+        # row keyed by None, cleared whenever the row is written to
+        self.encoded = [{} for _ in range(self.HEIGHT)]
+        # rows that have held a wide character, which the plain ASCII path
+        # of fill_units has to look out for
+        self.wide = set()
+        # rows of the viewport are ring buffers of logical columns, of which
+        # the window starting at viewport.offset is shown
+        self.viewport = None
+
+    @staticmethod
+    def char_width(char):
+        if char < "\u1100":
+            return 1
+        return 1 + (bisect_right(WIDE_CHAR_BOUNDS, ord(char)) & 1)
+
+    @staticmethod
+    def text_width(text):
+        if text.isascii():
+            return len(text)
+        return sum(map(Frame.char_width, text))
+
+    @staticmethod
+    def unpair(unit, before, after):
+        # overwriting one half of a wide character blanks the other half,
+        # as terminals do
+        if before is not None and unit.char == Frame.CONTINUATION:
+            before.char = " "
+        if after is not None and after.char == Frame.CONTINUATION:
+            after.char = " "
+
+    def slot(self, x, y):
+        viewport = self.viewport
+        if viewport is None or y not in viewport.rows or x < viewport.left:
+            return x if 0 <= x < self.WIDTH else None
+        x -= viewport.left
+        if viewport.offset <= x < viewport.offset + viewport.span:
+            return viewport.left + x % viewport.span
+        return None
+
+    def column(self, x, y):
+        viewport = self.viewport
+        if y in viewport.rows and \
+                x >= viewport.left + viewport.offset + viewport.span:
+            self.scroll(x - viewport.left - viewport.span + 1)
+        return self.slot(x, y)
+
+    def scroll(self, offset):
+        viewport = self.viewport
+        end = viewport.left + offset + viewport.span
+        start = max(end - offset + viewport.offset, end - viewport.span)
+        for x in range(start, end):
+            column = viewport.left + (x - viewport.left) % viewport.span
+            for y in viewport.rows:
+                self.units[y][column] = FrameUnit()
+        viewport.offset = offset
+        column = self.slot(viewport.left + offset, min(viewport.rows))
+        for y in viewport.rows:
+            self.encoded[y].clear()
+            unit = self.units[y][column]
+            if unit.char == self.CONTINUATION:
+                unit.char = " "
+
+    def screen_x(self, x):
+        viewport = self.viewport
+        if viewport is None or x < viewport.left:
+            return x
+        return x - viewport.offset
+
+    def line(self, y):
+        viewport = self.viewport
+        if viewport is None or not viewport.offset or y not in viewport.rows:
+            return self.units[y]
+        line = self.units[y]
+        left = viewport.left
+        right = left + viewport.span
+        split = left + viewport.offset % viewport.span
+        return (line[:left] + line[split:right] + line[left:split]
+                + line[right:])
+
+    def fill_viewport(self, text, x, y, fore=None, back=None, mapper=None):
+        head_x = x
+        dirty_y = None
+        for char in text:
+            if char == "\n":
+                y += 1
+                if y >= self.HEIGHT:
+                    return None
+                x = head_x
+            elif char == "\r":
+                x = 0
+            elif char == "\b":
+                if x > 0:
+                    x -= 1
+            elif mapper is not None:
+                column = self.column(x, y)
+                if column is not None and char in mapper:
+                    if y != dirty_y:
+                        dirty_y = y
+                        self.encoded[y].clear()
+                    unit = self.units[y][column]
+                    fore, back = mapper[char]
+                    if fore is not None:
+                        unit.fore = fore
+                    if back is not None:
+                        unit.back = back
+                x += 1
+            else:
+                width = self.char_width(char)
+                # reach the right half first, as it may scroll the left one
+                tail = self.column(x + 1, y) if width == 2 else None
+                column = self.column(x, y)
+                if column is not None and (width == 1 or tail is not None):
+                    if y != dirty_y:
+                        dirty_y = y
+                        self.encoded[y].clear()
+                    line = self.units[y]
+                    before = self.slot(x - 1, y)
+                    after = self.slot(x + width, y)
+                    self.unpair(line[column],
+                                None if before is None else line[before],
+                                None if after is None else line[after])
+                    unit = line[column]
+                    unit.char = char
+                    if fore is not None:
+                        unit.fore = fore
+                    if back is not None:
+                        unit.back = back
+                    if width == 2:
+                        self.wide.add(y)
+                        unit = line[tail]
+                        unit.char = self.CONTINUATION
+                        if fore is not None:
+                            unit.fore = fore
+                        if back is not None:
+                            unit.back = back
+                x += width
 
     def fill_units(self, text, x=0, y=0, fore=None, back=None):
         if y >= self.HEIGHT:
             return None
+        if self.viewport is not None:
+            return self.fill_viewport(text, x, y, fore, back)
         head_x = x
+        dirty_y = None
         for char in text:
             if char == "\n":
                 y += 1
@@ -74,18 +271,51 @@ class Frame:
                 if x > 0:
                     x -= 1
             elif x < self.WIDTH:
-                unit = self.units[y][x]
+                if y != dirty_y:
+                    dirty_y = y
+                    self.encoded[y].clear()
+                    line = self.units[y]
+                    plain = y not in self.wide
+                if plain and char < "\u1100":
+                    unit = line[x]
+                    unit.char = char
+                    if fore is not None:
+                        unit.fore = fore
+                    if back is not None:
+                        unit.back = back
+                    x += 1
+                    continue
+                width = self.char_width(char)
+                if x + width > self.WIDTH:
+                    # no room left for the right half of a wide character
+                    x += width
+                    continue
+                self.unpair(line[x], line[x-1] if x else None,
+                            line[x+width] if x + width < self.WIDTH else None)
+                unit = line[x]
                 unit.char = char
                 if fore is not None:
                     unit.fore = fore
                 if back is not None:
                     unit.back = back
-                x += 1
+                if width == 2:
+                    self.wide.add(y)
+                    plain = False
+                    unit = line[x+1]
+                    unit.char = self.CONTINUATION
+                    if fore is not None:
+                        unit.fore = fore
+                    if back is not None:
+                        unit.back = back
+                x += width
 
     def fill_style(self, text, mapper, x=0, y=0):
         if y >= self.HEIGHT:
             return None
+        if self.viewport is not None:
+            return self.fill_viewport(text, x, y, mapper=mapper)
         head_x = x
+        dirty_y = None
         for char in text:
             if char == "\n":
                 y += 1
@@ -99,6 +329,9 @@ class Frame:
                     x -= 1
             elif x < self.WIDTH:
                 if char in mapper:
+                    if y != dirty_y:
+                        dirty_y = y
+                        self.encoded[y].clear()
                     unit = self.units[y][x]
                     style = mapper[char]
                     if style[0] is not None:
@@ -107,37 +340,1398 @@ class Frame:
                         unit.back = style[1]
                 x += 1
 
+    def encode_row(self, y, last_fore=None, last_back=None):
+        encoded = self.encoded[y].get((last_fore, last_back))
+        if encoded is not None:
+            return encoded
+        state = (last_fore, last_back)
+        prelis = []
+        for unit in self.line(y):
+            if unit.char == self.CONTINUATION:
+                continue
+            if unit.fore != last_fore:
+                last_fore = unit.fore
+                prelis.append(FORE_COLOR_MAP[last_fore])
+            if unit.back != last_back:
+                last_back = unit.back
+                prelis.append(BACK_COLOR_MAP[last_back])
+            prelis.append(unit.char)
+        encoded = self.encoded[y][state] = ("".join(prelis), last_fore,
+                                            last_back)
+        return encoded
+
     def get_string(self):
         last_fore = last_back = None
-        prelis = []
-        for line in self.units:
-            if prelis:
-                prelis.append("\r\n")
-            for unit in line:
-                if unit.fore != last_fore:
-                    last_fore = unit.fore
-                    prelis.append(FORE_COLOR_MAP[last_fore])
-                if unit.back != last_back:
-                    last_back = unit.back
-                    prelis.append(BACK_COLOR_MAP[last_back])
-                prelis.append(unit.char)
-        return "".join(prelis)
+        rows = []
+        for y in range(self.HEIGHT):
+            row, last_fore, last_back = self.encode_row(y, last_fore,
+                                                        last_back)
+            rows.append(row)
+        return "\r\n".join(rows)
+
+    def get_rows(self):
+        return [self.encode_row(y)[0] for y in range(self.HEIGHT)]
+
+    def raw_row(self, y):
+        raw = self.encoded[y].get(None)
+        if raw is None:
+            line = self.line(y)
+            raw = self.encoded[y][None] = (
+                "".join([unit.char for unit in line]),
+                bytes([unit.fore for unit in line]),
+                bytes([unit.back for unit in line])
+            )
+        return raw
+
+    def snapshot(self):
+        return tuple(map(self.raw_row, range(self.HEIGHT)))
+
+    def load(self, snapshot):
+        for y, row in enumerate(snapshot):
+            if self.raw_row(y) == row:
+                continue
+            self.encoded[y].clear()
+            if self.CONTINUATION in row[0]:
+                self.wide.add(y)
+            for unit, char, fore, back in zip(self.units[y], *row):
+                unit.char = char
+                unit.fore = fore
+                unit.back = back
 
     def copy(self):
         copied = type(self)()
         for y in range(self.HEIGHT):
             for x in range(self.WIDTH):
                 copied.units[y][x] = self.units[y][x].copy()
+            copied.encoded[y].update(self.encoded[y])
+        copied.wide.update(self.wide)
+        if self.viewport is not None:
+            copied.viewport = self.viewport.copy()
         return copied
 
+
+class BitmapFont:
+    def __init__(self, *strips, spacing=1):
+        self.glyphs = {}
+        self.height = 0
+        for chars, strip, width in strips:
+            rows = strip.split("\n")
+            self.height = max(self.height, len(rows))
+            for index, char in enumerate(chars):
+                left = index * (width + 1)
+                self.glyphs[char] = [row[left:left+width].ljust(width)
+                                     for row in rows]
+        for char, glyph in self.glyphs.items():
+            glyph += [" " * len(glyph[0])] * (self.height - len(glyph))
+            self.glyphs[char] = tuple(glyph)
+        self.spacing = spacing
+        width = min(len(glyph[0]) for glyph in self.glyphs.values())
+        self.blank = (" " * width,) * self.height
+
+    def glyph(self, char):
+        if char == " ":
+            return self.blank
+        glyph = self.glyphs.get(char)
+        if glyph is None:
+            glyph = self.glyphs.get(char.upper())
+        if glyph is None:
+            raise ValueError("no glyph for {0!r} in the font".format(char))
+        return glyph
+
+    @lru_cache(maxsize=256)
+    def rasterize(self, text, colors, paper=None):
+        mapper = {chr(48 + index): color
+                  for index, color in enumerate(colors)}
+        if paper is not None:
+            mapper[" "] = paper
+        gap = " " * self.spacing
+        blocks = []
+        count = 0
+        for text_line in text.split("\n"):
+            rows = [[] for _ in range(self.height)]
+            for char in text_line:
+                ink = chr(48 + count % len(colors))
+                count += 1
+                for row, glyph_row in zip(rows, self.glyph(char)):
+                    if row:
+                        row.append(gap)
+                    row.append("".join(ink if cell != " " else " "
+                                       for cell in glyph_row))
+            blocks.append("\n".join("".join(row) for row in rows))
+        # the result is cached and shared, so the mapper is read-only
+        return ("\n" * (self.spacing + 1)).join(blocks), \
+            MappingProxyType(mapper)
+
+
+BIG_FONT = BitmapFont(("ABC123", """\
+   AAA    BBBBBBB      CCCCC     11      2222222   3333333
+  AA AA   BB    BB   CCC   CC  11 1     22     22 33     33
+ AA   AA  BB   BB   CC        1   1           22        33
+AA     AA BBBBBB    CC            1         222      3333
+AAAAAAAAA BB   BBB  CC            1       222           33
+AA     AA BB     BB CC            1      22              33
+AA     AA BB    BB   CCC   CC     1     22        33    33
+AA     AA BBBBBBB      CCCCC  111111111 222222222  333333""", 9), spacing=2)
+SMALL_FONT = BitmapFont(("ABCDEFGHIJKLM", """\
+ A  BB   CC DD  EEE FFF  GG H H III   J K K L   M M
+A A B B C   D D E   F   G   H H  I    J K K L   MMM
+AAA BB  C   D D EE  FF  G G HHH  I    J KK  L   MMM
+A A B B C   D D E   F   G G H H  I  J J K K L   M M
+A A BB   CC DD  EEE F    GG H H III  J  K K LLL M M""", 3),
+    ("NOPQRSTUVWXYZ", """\
+NN   O  PP   Q  RR   SS TTT U U V V W W X X Y Y ZZZ
+N N O O P P Q Q R R S    T  U U V V W W X X Y Y   Z
+N N O O PP  Q Q RR   S   T  U U V V WWW  X   Y   Z
+N N O O P   QQ  R R   S  T  U U V V WWW X X  Y  Z
+N N  O  P    QQ R R SS   T  UUU  V  W W X X  Y  ZZZ""", 3),
+    ("0123456789!?'-.:,/", """\
+000  1  22  33  4 4 555  66 777 888 999  #  ##   #                    #
+0 0 11    2   3 4 4 5   6     7 8 8 9 9  #    #  #           #        #
+0 0  1   2   3  444 55  666  7  888 999  #   #      ###              #
+0 0  1  2     3   4   5 6 6  7  8 8   9                      #   #  #
+000 111 222 33    4 55  666  7  888 99   #   #           #      #   #""", 3))
+
+
+class Capabilities:
+    SYNC_BEGIN = "\033[?2026h"
+    SYNC_END = "\033[?2026l"
+    CURSOR_HIDE = "\033[?25l"
+    CURSOR_SHOW = "\033[?25h"
+
+    def __init__(self, fd, query_fd=None):
+        self.tty = os.isatty(fd)
+        self.sync = self.cursor = False
+        self.colors = 8
+        if not self.tty:
+            return None
+        term = os.environ.get("TERM", "")
+        self.cursor = term != "dumb"
+        if "256color" in term or \
+                os.environ.get("COLORTERM") in ("truecolor", "24bit"):
+            self.colors = 256
+        try:
+            import curses
+            curses.setupterm(term or None, fd)
+            self.colors = max(self.colors, curses.tigetnum("colors"))
+            self.cursor = bool(curses.tigetstr("civis")
+                               and curses.tigetstr("cnorm"))
+        except Exception:
+            pass
+        if query_fd is not None:
+            match = re.search(br"\033\[\?2026;(\d)\$y",
+                              self.query(query_fd, b"\033[?2026$p"))
+            self.sync = match is not None and match.group(1) in b"12"
+
+    @staticmethod
+    def query_fd(fd):
+        try:
+            if os.isatty(0) and os.ttyname(0) == os.ttyname(fd):
+                return 0
+        except OSError:
+            pass
+        return fd
+
+    @staticmethod
+    def query(fd, request, timeout=0.2):
+        if termios is None:
+            return b""
+        try:
+            old = termios.tcgetattr(fd)
+        except (termios.error, OSError):
+            return b""
+        new = termios.tcgetattr(fd)
+        new[3] &= ~(termios.ICANON | termios.ECHO)
+        new[6][termios.VMIN] = new[6][termios.VTIME] = 0
+        response = b""
+        try:
+            termios.tcsetattr(fd, termios.TCSANOW, new)
+            # DA1 is answered by every terminal, so it ends the wait early
+            os.write(fd, request + b"\033[c")
+            deadline = monotonic() + timeout
+            while not re.search(br"\033\[\?[\d;]*c", response):
+                left = deadline - monotonic()
+                if left <= 0 or not select([fd], [], [], left)[0]:
+                    break
+                chunk = os.read(fd, 1024)
+                if not chunk:
+                    break
+                response += chunk
+        except OSError:
+            pass
+        finally:
+            termios.tcsetattr(fd, termios.TCSANOW, old)
+        return response
+
+    def prologue(self):
+        return self.CURSOR_HIDE if self.cursor else ""
+
+    def epilogue(self):
+        return (FORE_COLOR_MAP[9] + BACK_COLOR_MAP[9] if self.tty else "") + \
+            (self.SYNC_END if self.sync else "") + \
+            (self.CURSOR_SHOW if self.cursor else "")
+
+    def describe(self):
+        if not self.tty:
+            return "not a terminal"
+        return "synchronized output: {0}, cursor hide/show: {1}, " \
+            "colors: {2}".format("yes" if self.sync else "no",
+                                 "yes" if self.cursor else "no", self.colors)
+
+
+class StreamSink:
+    def __init__(self, stream):
+        self.name = getattr(stream, "name", "<stream>")
+        self.stream = stream
+        self.failed = None
+        fd = stream.fileno()
+        self.caps = Capabilities(fd, Capabilities.query_fd(fd))
+        self.stream.write(self.caps.prologue())
+        self.stream.flush()
+
+    def push(self, text, data, rows):
+        if self.caps.sync:
+            text = Capabilities.SYNC_BEGIN + text + Capabilities.SYNC_END
+        self.stream.write(text)
+        self.stream.flush()
+
+    def patch(self, text, data, rows):
+        self.push(text, data, rows)
+        return True
+
+    def flush(self):
+        return True
+
+    def close(self):
+        try:
+            self.stream.write(self.caps.epilogue())
+            self.stream.flush()
+        except OSError:
+            pass
+
+
+class FdSink:
+    def __init__(self, target):
+        self.name = target
+        if target == "-":
+            self.fd = stdout.fileno()
+            self.owned = False
+        elif target.isdigit():
+            self.fd = int(target)
+            self.owned = False
+            # fails early on a descriptor that is not open
+            os.fstat(self.fd)
+        else:
+            self.fd = os.open(target, os.O_RDWR | os.O_CREAT | os.O_TRUNC
+                              | getattr(os, "O_NOCTTY", 0), 0o666)
+            self.owned = True
+        self.caps = Capabilities(self.fd, Capabilities.query_fd(self.fd))
+        if self.caps.sync:
+            self.begin = Capabilities.SYNC_BEGIN.encode()
+            self.end = Capabilities.SYNC_END.encode()
+        else:
+            self.begin = self.end = b""
+        try:
+            self.was_blocking = os.get_blocking(self.fd)
+            os.set_blocking(self.fd, False)
+        except (AttributeError, OSError):
+            self.was_blocking = None
+        self.pending = memoryview(self.caps.prologue().encode())
+        self.queued = None
+        self.written = 0
+        self.since = None
+        self.dropped = 0
+        self.max_lag = 0.
+        self.failed = None
+
+    def push(self, text, data, rows):
+        if self.failed is not None:
+            return None
+        if self.queued is not None:
+            self.dropped += 1
+        self.queued = (data, rows)
+        if self.since is None:
+            self.since = monotonic()
+        self.flush()
+
+    def patch(self, text, data, rows):
+        if self.pending or self.queued is not None or \
+                self.failed is not None:
+            return False
+        self.pending = memoryview(self.begin + data + self.end
+                                  if self.begin else data)
+        self.flush()
+        return True
+
+    def dequeue(self):
+        data = self.queued[0]
+        self.queued = None
+        return self.begin + data + self.end if self.begin else data
+
+    def ready(self):
+        return True
+
+    def flush(self):
+        while True:
+            if not self.pending:
+                if self.queued is None:
+                    if self.since is not None:
+                        self.max_lag = max(self.max_lag,
+                                           monotonic() - self.since)
+                        self.since = None
+                    return True
+                if not self.ready():
+                    self.max_lag = max(self.max_lag, monotonic() - self.since)
+                    return False
+                self.pending = memoryview(self.dequeue())
+                continue
+            try:
+                written = os.write(self.fd, self.pending)
+            except (BlockingIOError, InterruptedError):
+                written = 0
+            except OSError as exc:
+                self.fail(exc)
+                return True
+            if not written:
+                self.max_lag = max(self.max_lag, monotonic() - self.since)
+                return False
+            self.written += written
+            self.pending = self.pending[written:]
+
+    def fail(self, exc):
+        # a write error stops this output only, and the others play on
+        self.failed = exc
+        self.pending = memoryview(b"")
+        self.queued = self.since = None
+        print("{0}: output stopped: {1}".format(
+            self.name, exc.strerror or exc), file=stderr)
+
+    def close(self):
+        try:
+            if self.was_blocking is not None and self.failed is None:
+                os.set_blocking(self.fd, True)
+                while not self.flush():
+                    sleep(0.001)
+            epilogue = self.caps.epilogue().encode()
+            while epilogue and self.failed is None:
+                try:
+                    epilogue = epilogue[os.write(self.fd, epilogue):]
+                except (BlockingIOError, InterruptedError):
+                    sleep(0.001)
+            if self.was_blocking is not None and not self.was_blocking:
+                os.set_blocking(self.fd, False)
+        except OSError as exc:
+            if self.failed is None:
+                self.fail(exc)
+        if self.owned:
+            os.close(self.fd)
+
+
+class RowEncoder:
+    LEVELS = ("full", "changed rows", "changed rows without colors")
+    COLOR_CODE = re.compile("\033\\[\\d+m")
+    RESET = (FORE_COLOR_MAP[9] + BACK_COLOR_MAP[9]).encode()
+
+    def __init__(self):
+        self.shown = [None] * Frame.HEIGHT
+
+    def delta(self, rows):
+        prelis = []
+        for y, row in enumerate(rows):
+            if self.shown[y] != row:
+                prelis.append("\033[{0};1H".format(y+1))
+                prelis.append(row)
+        return "".join(prelis).encode()
+
+    def strip(self, rows):
+        return [self.COLOR_CODE.sub("", row) for row in rows]
+
+    def encode(self, data, rows, level):
+        if level == 1:
+            data = self.delta(rows)
+        elif level == 2:
+            rows = self.strip(rows)
+            data = self.RESET + self.delta(rows)
+        if rows is not None:
+            self.shown[:] = rows
+        return data
+
+
+class AdaptiveSink(FdSink):
+    def __init__(self, target, spf):
+        FdSink.__init__(self, target)
+        self.spf = spf
+        self.rate = None
+        self.mark = None
+        self.encoder = RowEncoder()
+        self.levels = [0] * len(RowEncoder.LEVELS)
+        # bytes still queued in the kernel are not delivered yet, and
+        # counting them as sent would hide a slow link behind its buffer
+        self.outq = None
+        if termios is not None:
+            mode = os.fstat(self.fd).st_mode
+            if os.isatty(self.fd) or stat.S_ISSOCK(mode):
+                self.outq = getattr(termios, "TIOCOUTQ", None)
+            elif stat.S_ISFIFO(mode):
+                self.outq = getattr(termios, "FIONREAD", None)
+
+    def backlog(self):
+        if self.outq is None:
+            return 0
+        try:
+            return struct.unpack("i", ioctl(self.fd, self.outq, b"\0" * 4))[0]
+        except OSError:
+            self.outq = None
+            return 0
+
+    def push(self, text, data, rows):
+        now = perf_counter()
+        backlog = self.backlog()
+        delivered = self.written - backlog
+        busy = bool(backlog or self.pending)
+        if self.mark is not None:
+            then, before, was_busy = self.mark
+            sample = (delivered - before) / max(now - then, 1e-6)
+            if busy and was_busy:
+                self.rate = sample if self.rate is None \
+                    else (self.rate + sample) / 2
+            elif self.rate is not None:
+                self.rate = max(self.rate, sample) * 1.25
+        self.mark = (now, delivered, busy)
+        FdSink.push(self, text, data, rows)
+
+    def patch(self, text, data, rows):
+        if not FdSink.patch(self, text, data, rows):
+            return False
+        for y in rows:
+            self.encoder.shown[y] = None
+        return True
+
+    def ready(self):
+        return self.rate is None or \
+            self.backlog() <= self.rate * self.spf * 0.5
+
+    def dequeue(self):
+        data, rows = self.queued
+        self.queued = None
+        budget = None if self.rate is None else self.rate * self.spf * 0.8
+        level = 0
+        # a PV from the playlist may come without rows to send apart
+        if budget is not None and len(data) > budget and rows is not None:
+            level = 1
+            if len(self.encoder.delta(rows)) > budget:
+                level = 2
+        data = self.encoder.encode(data, rows, level)
+        self.levels[level] += 1
+        return self.begin + data + self.end if self.begin else data
+
+
+class Overlay:
+    LANE_X = 9
+    PLAYHEAD = (0, "v", 7, 9)
+    LYRIC_ROWS = (4, 5)
+    LYRIC_BACK = 4
+    BAR = (23, 72, 5, "=", 1, 9)
+
+    def __init__(self, timeline, snapshots, offset=0):
+        self.timeline = timeline
+        self.snapshots = snapshots
+        self.offset = offset
+        self.index = None
+        # cells drawn on each sink over the current frame, as a sink may
+        # skip a patch while it is busy
+        self.drawn = {}
+
+    def cells(self, index, phase):
+        if self.timeline[index] is None:
+            return {}
+        start, end = self.timeline[index]
+        cells = {}
+        snapshot = self.snapshots[index]
+        y, char, fore, back = self.PLAYHEAD
+        x = start + int(phase * (end - start))
+        if x < Frame.WIDTH:
+            cells[x, y] = (char, fore, back)
+        for y in self.LYRIC_ROWS:
+            chars, fores, _ = snapshot[y]
+            for x in range(start, min(start + int(phase * (end - start)),
+                                      Frame.WIDTH)):
+                if chars[x] not in (" ", Frame.CONTINUATION):
+                    cells[x, y] = (chars[x], fores[x], self.LYRIC_BACK)
+        y, left, width, char, fore, back = self.BAR
+        filled = int(width * (((index + self.offset) & 1) + phase) / 2)
+        for x in range(left, left + width):
+            cells[x, y] = (char if x - left < filled else " ", fore, back)
+        return cells
+
+    def draw(self, index, phase, sinks):
+        if index != self.index:
+            self.index = index
+            self.drawn = {}
+        cells = self.cells(index, phase)
+        for sink in sinks:
+            patch = self.patch(index, cells, self.drawn.get(sink, {}))
+            if patch is None:
+                continue
+            text, rows = patch
+            if sink.patch(text, text.encode(), rows):
+                self.drawn[sink] = cells
+
+    def clear(self, sinks):
+        # puts back what the frame has under the overlay before the frames
+        # stop or another PV takes over, leaving the cursor where the frame
+        # itself leaves it
+        for sink in sinks:
+            drawn = self.drawn.pop(sink, None)
+            if not drawn:
+                continue
+            text, rows = self.patch(self.index, {}, drawn)
+            text += "\033[{0};{1}H".format(Frame.HEIGHT, Frame.WIDTH + 1)
+            while not sink.patch(text, text.encode(), rows) and \
+                    sink.failed is None:
+                sink.flush()
+                sleep(0.001)
+
+    def patch(self, index, cells, drawn):
+        snapshot = self.snapshots[index]
+        changed = {}
+        for (x, y), cell in cells.items():
+            if drawn.get((x, y)) != cell:
+                changed[x, y] = cell
+        for x, y in drawn:
+            if (x, y) not in cells:
+                chars, fores, backs = snapshot[y]
+                changed[x, y] = (chars[x], fores[x], backs[x])
+        if not changed:
+            return None
+        prelis = []
+        rows = set()
+        last = None
+        last_fore = last_back = None
+        for x, y in sorted(changed, key=lambda cell: (cell[1], cell[0])):
+            char, fore, back = changed[x, y]
+            if last != (x - 1, y):
+                prelis.append("\033[{0};{1}H".format(y+1, x+1))
+                last_fore = last_back = None
+            if fore != last_fore:
+                last_fore = fore
+                prelis.append(FORE_COLOR_MAP[fore])
+            if back != last_back:
+                last_back = back
+                prelis.append(BACK_COLOR_MAP[back])
+            prelis.append(char)
+            rows.add(y)
+            last = (x, y)
+        return "".join(prelis), rows
+
+
+class VTScreen:
+    TOKEN = re.compile("\033\\[([0-9;?]*)[ -/]*([@-~])|\033|\r|\n|"
+                       "[^\033\r\n]+")
+
+    def __init__(self):
+        self.units = [[FrameUnit() for _ in range(Frame.WIDTH)]
+                      for _ in range(Frame.HEIGHT)]
+        self.x = self.y = 0
+        self.fore = self.back = 9
+        self.unknown = 0
+        self.sgr = {0: (9, 9)}
+        for index, code in enumerate(FORE_COLOR_MAP):
+            if code:
+                self.sgr[int(code[2:-1])] = (index, None)
+        for index, code in enumerate(BACK_COLOR_MAP):
+            if code:
+                self.sgr[int(code[2:-1])] = (None, index)
+
+    def feed(self, text):
+        escapes = 0
+        for match in self.TOKEN.finditer(text):
+            token = match.group()
+            if token[0] == "\033":
+                escapes += 1
+                self.control(match.group(1), match.group(2))
+            elif token == "\r":
+                self.x = 0
+            elif token == "\n":
+                self.y = min(self.y + 1, Frame.HEIGHT - 1)
+            else:
+                for char in token:
+                    width = Frame.char_width(char)
+                    if self.x + width > Frame.WIDTH:
+                        self.unknown += 1
+                        self.x += width
+                        continue
+                    line = self.units[self.y]
+                    end = self.x + width
+                    Frame.unpair(line[self.x],
+                                 line[self.x-1] if self.x else None,
+                                 line[end] if end < Frame.WIDTH else None)
+                    for x in range(self.x, end):
+                        unit = line[x]
+                        unit.char = char if x == self.x else \
+                            Frame.CONTINUATION
+                        unit.fore = self.fore
+                        unit.back = self.back
+                    self.x = end
+        return escapes
+
+    def control(self, params, final):
+        if final is None:
+            self.unknown += 1
+            return None
+        if params.startswith("?"):
+            if final not in "hl":
+                self.unknown += 1
+            return None
+        args = [int(param) if param else 0 for param in params.split(";")]
+        count = max(1, args[0])
+        if final == "H":
+            args += [1, 1]
+            self.y = min(max(args[0], 1), Frame.HEIGHT) - 1
+            self.x = min(max(args[1], 1), Frame.WIDTH) - 1
+        elif final == "A":
+            self.y = max(self.y - count, 0)
+        elif final == "B":
+            self.y = min(self.y + count, Frame.HEIGHT - 1)
+        elif final == "C":
+            self.x = min(self.x + count, Frame.WIDTH - 1)
+        elif final == "D":
+            self.x = max(min(self.x, Frame.WIDTH - 1) - count, 0)
+        elif final == "m":
+            for arg in args:
+                if arg not in self.sgr:
+                    self.unknown += 1
+                    continue
+                fore, back = self.sgr[arg]
+                if fore is not None:
+                    self.fore = fore
+                if back is not None:
+                    self.back = back
+        else:
+            self.unknown += 1
+
+    def compare(self, snapshot, colors=True):
+        differ = []
+        for y, (chars, fores, backs) in enumerate(snapshot):
+            for x, unit in enumerate(self.units[y]):
+                if unit.char != chars[x] or colors and (
+                        unit.fore != fores[x] or unit.back != backs[x]):
+                    differ.append((x, y))
+        return differ
+
+
+class VTSink:
+    def __init__(self, level=0):
+        self.name = "<vt>"
+        self.level = level
+        self.encoder = RowEncoder()
+        self.screen = VTScreen()
+        self.stats = []
+        self.encoding = 0.
+
+    def push(self, text, data, rows):
+        start = perf_counter()
+        payload = self.encoder.encode(data, rows, self.level)
+        self.encoding += perf_counter() - start
+        self.stats.append((len(payload), self.screen.feed(payload.decode())))
+
+    def flush(self):
+        return True
+
+    def close(self):
+        pass
+
+
+class Backend:
+    def __init__(self, keep_rows=False, keep_snapshots=False,
+                 keep_timeline=False):
+        self.rows = [] if keep_rows else None
+        self.snapshots = [] if keep_snapshots else None
+        self.timeline = [] if keep_timeline else None
+        self.note_x = None
+        self.log = None
+
+    def emit(self, frame, note_x=None):
+        record = self.record(frame, note_x)
+        self.append(record)
+        if self.log is not None:
+            self.log.append(record)
+
+    def record(self, frame, note_x):
+        span = None
+        if self.timeline is not None and note_x is not None:
+            start = self.note_x
+            if start is None or start > note_x:
+                start = Overlay.LANE_X
+            span = (frame.screen_x(start), frame.screen_x(note_x))
+        return (note_x,
+                None if self.rows is None else frame.get_rows(),
+                None if self.snapshots is None else frame.snapshot(),
+                span)
+
+    def append(self, record):
+        note_x, rows, snapshot, span = record[:4]
+        self.note_x = note_x
+        if self.rows is not None:
+            self.rows.append(rows)
+        if self.snapshots is not None:
+            self.snapshots.append(snapshot)
+        if self.timeline is not None:
+            self.timeline.append(span)
+
+
+class StringBackend(Backend):
+    def __init__(self, *args):
+        Backend.__init__(self, *args)
+        self.strs = []
+
+    def record(self, frame, note_x):
+        return Backend.record(self, frame, note_x) + (frame.get_string(),)
+
+    def append(self, record):
+        Backend.append(self, record)
+        self.strs.append(record[4])
+
+    def finish(self):
+        return self.strs
+
+
+class TensorBackend(Backend):
+    def __init__(self, *args):
+        import numpy
+        Backend.__init__(self, *args)
+        self.numpy = numpy
+        self.row_chars = []
+        self.row_fores = []
+        self.row_backs = []
+
+    def record(self, frame, note_x):
+        return Backend.record(self, frame, note_x) + tuple(
+            zip(*map(frame.raw_row, range(Frame.HEIGHT))))
+
+    def append(self, record):
+        Backend.append(self, record)
+        self.row_chars.extend(record[4])
+        self.row_fores.extend(record[5])
+        self.row_backs.extend(record[6])
+
+    def finish(self):
+        numpy = self.numpy
+        shape = (-1, Frame.HEIGHT, Frame.WIDTH)
+        self.chars = numpy.array(self.row_chars,
+                                 dtype="U{0}".format(Frame.WIDTH)
+                                 ).view("U1").reshape(shape)
+        self.fores = numpy.frombuffer(b"".join(self.row_fores),
+                                      dtype=numpy.uint8).reshape(shape)
+        self.backs = numpy.frombuffer(b"".join(self.row_backs),
+                                      dtype=numpy.uint8).reshape(shape)
+        del self.row_chars, self.row_fores, self.row_backs
+        self.changed = numpy.ones(self.chars.shape, dtype=bool)
+        self.changed[1:] = (self.chars[1:] != self.chars[:-1]) | \
+            (self.fores[1:] != self.fores[:-1]) | \
+            (self.backs[1:] != self.backs[:-1])
+        self.dirty_rows = self.changed.any(axis=2)
+        self.identical = ~self.dirty_rows.any(axis=1)
+        # continuation cells take no output and keep the SGR state of the
+        # wide character on their left
+        tail = self.chars == Frame.CONTINUATION
+        fores = numpy.where(tail, numpy.roll(self.fores, 1, axis=2),
+                            self.fores)
+        backs = numpy.where(tail, numpy.roll(self.backs, 1, axis=2),
+                            self.backs)
+        # a clean row can reuse its previous encoding only if the SGR state
+        # it starts with, i.e. the last unit of the row above, is unchanged
+        state_changed = numpy.ones(self.dirty_rows.shape, dtype=bool)
+        state_changed[1:] = (fores[1:, :, -1] != fores[:-1, :, -1]) | \
+            (backs[1:, :, -1] != backs[:-1, :, -1])
+        reusable = ~self.dirty_rows
+        reusable[:, 1:] &= ~state_changed[:, :-1]
+        index, y = numpy.nonzero(~reusable)
+        cells = numpy.where(tail[index, y], "",
+                            self.chars[index, y]).astype(object)
+        # prefix the SGR codes at the cells where the state changes, the
+        # state before the first row being none, which matches no color
+        state = numpy.empty((len(index), Frame.WIDTH + 1), dtype=numpy.int16)
+        for planes, color_map in ((backs, BACK_COLOR_MAP),
+                                  (fores, FORE_COLOR_MAP)):
+            state[:, 1:] = planes[index, y]
+            state[:, 0] = numpy.where(y > 0, planes[index, y-1, -1], -1)
+            points = state[:, 1:] != state[:, :-1]
+            cells[points] = numpy.array(color_map, dtype=object)[
+                state[:, 1:][points]] + cells[points]
+        encoded = {}
+        for frame, row, prelis in zip(index.tolist(), y.tolist(),
+                                      cells.tolist()):
+            encoded.setdefault(frame, []).append((row, "".join(prelis)))
+        strs = []
+        rows = [""] * Frame.HEIGHT
+        for frame in range(len(self.chars)):
+            if frame in encoded:
+                rows = list(rows)
+                for row, line in encoded[frame]:
+                    rows[row] = line
+                strs.append("\r\n".join(rows))
+            else:
+                strs.append(strs[-1])
+        return strs
+
+    def export(self, path):
+        self.numpy.savez_compressed(
+            path, chars=self.chars, fore=self.fores, back=self.backs,
+            changed=self.changed, dirty_rows=self.dirty_rows,
+            identical=self.identical
+        )
+
+
+class Lane(dict):
+    def __init__(self, *args):
+        dict.__init__(self, *args)
+        # slots that a section of the PV is built from
+        self.built = set()
+
+    def __missing__(self, key):
+        return None
+
+
+class ScoreImporter:
+    # diatonic steps of the 12 pitch classes, black keys fall to the white
+    # key below; lane values count from C3 (MIDI 48) with these offsets
+    DIATONIC = (0, 0, 1, 1, 2, 3, 3, 4, 4, 5, 5, 6)
+    OFFSETS = (("MUSIC_HI", 13), ("MUSIC_LO", -1), ("VOCAL", 6))
+
+    def __init__(self, path):
+        self.path = path
+        # events dropped for landing in a slot already taken, by lane name
+        self.collisions = {}
+
+    @staticmethod
+    def byte(file):
+        data = file.read(1)
+        if not data:
+            raise ValueError("unexpected end of file")
+        return data[0]
+
+    def varlen(self, file):
+        value = 0
+        while True:
+            byte = self.byte(file)
+            value = (value << 7) | (byte & 0x7F)
+            if not byte & 0x80:
+                return value
+
+    def events(self, file, length):
+        end = file.tell() + length
+        tick = 0
+        status = None
+        while file.tell() < end:
+            tick += self.varlen(file)
+            byte = self.byte(file)
+            if byte == 0xFF:
+                kind = self.byte(file)
+                yield tick, 0xFF, kind, file.read(self.varlen(file))
+            elif byte in (0xF0, 0xF7):
+                file.seek(self.varlen(file), 1)
+            else:
+                if byte & 0x80:
+                    status = byte
+                    first = self.byte(file)
+                elif status is None:
+                    raise ValueError("running status without a status byte")
+                else:
+                    first = byte
+                if status & 0xE0 == 0xC0:
+                    yield tick, status & 0xF0, first, None
+                else:
+                    yield tick, status & 0xF0, first, self.byte(file)
+        file.seek(end)
+
+    def chunks(self, file):
+        while True:
+            head = file.read(8)
+            if len(head) < 8:
+                return None
+            kind, length = struct.unpack(">4sI", head)
+            yield kind, length
+
+    @staticmethod
+    def text(data):
+        try:
+            return data.decode("utf-8")
+        except UnicodeDecodeError:
+            return data.decode("latin-1")
+
+    def read(self):
+        lanes = {}
+        with open(self.path, "rb") as file:
+            chunks = self.chunks(file)
+            kind, length = next(chunks, (None, 0))
+            if kind != b"MThd" or length < 6:
+                raise ValueError("not a Standard MIDI File")
+            division = struct.unpack(">HHH", file.read(6))[2]
+            file.seek(length - 6, 1)
+            if division & 0x8000:
+                raise ValueError("SMPTE time division is not supported")
+            for kind, length in chunks:
+                if kind != b"MTrk":
+                    file.seek(length, 1)
+                    continue
+                name = None
+                notes = Lane()
+                lyrics = Lane()
+                collisions = {"_NOTES": 0, "_LYRICS": 0}
+                for tick, status, first, second in self.events(file, length):
+                    slot = (tick + (division >> 1)) // division
+                    if status == 0xFF:
+                        if first == 0x03 and name is None:
+                            name = self.text(second).strip().upper() \
+                                .replace(" ", "_").replace("-", "_")
+                        elif first in (0x01, 0x05):
+                            if slot in lyrics:
+                                collisions["_LYRICS"] += 1
+                            else:
+                                lyrics[slot] = self.text(second).strip()
+                    elif status == 0x90 and second:
+                        if slot in notes:
+                            collisions["_NOTES"] += 1
+                        else:
+                            notes[slot] = first
+                if name is None:
+                    continue
+                for suffix, count in collisions.items():
+                    if count:
+                        self.collisions[name + suffix] = count
+                for prefix, offset in self.OFFSETS:
+                    if notes and name.startswith(prefix):
+                        lane = lanes[name + "_NOTES"] = Lane()
+                        for slot, pitch in notes.items():
+                            octave, step = divmod(pitch - 48, 12)
+                            lane[slot] = octave * 7 + self.DIATONIC[step] - \
+                                offset
+                        break
+                if lyrics:
+                    lanes[name + "_LYRICS"] = lyrics
+        return lanes
+
+
+class Playlist:
+    def __init__(self, paths, argv=()):
+        self.paths = list(paths)
+        self.argv = list(argv)
+        self.future = None
+        self.executor = None
+
+    def load(self, path):
+        import runpy
+        namespace = runpy.run_path(path, {"PLAYLIST_ARGV": self.argv},
+                                   run_name="__playlist__")
+        return (namespace["FRAME_STRS"], namespace.get("FRAME_ROWS"),
+                namespace.get("FPS", FPS))
+
+    def prefetch(self):
+        if self.future is None and self.paths:
+            if self.executor is None:
+                from concurrent.futures import ThreadPoolExecutor
+                self.executor = ThreadPoolExecutor(max_workers=1)
+            self.future = self.executor.submit(self.load, self.paths[0])
+
+    def next(self):
+        while self.paths:
+            self.prefetch()
+            path = self.paths.pop(0)
+            future, self.future = self.future, None
+            try:
+                return path, future.result()
+            except (Exception, SystemExit) as exc:
+                # a PV that fails to parse its arguments exits instead
+                print("cannot load PV {0}: {1!r}".format(path, exc),
+                      file=stderr)
+        return None, None
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+
+
+class BuildProfiler:
+    HOOKED = ("copy", "fill_units", "fill_style", "get_string")
+
+    def __init__(self, output=None, format="report", memory=False):
+        self.output = output
+        self.format = format
+        self.order = []
+        self.totals = {}
+        self.calls = {}
+        self.memory = {}
+        self.current = None
+        self.started = None
+        self.saved = {}
+        self.profile = None
+        self.tracemalloc = None
+        if output is None:
+            return None
+        # tracing allocations slows down every call, so it is a pass of its
+        # own in which the calls to Frame are not timed
+        if memory:
+            import tracemalloc
+            self.tracemalloc = tracemalloc
+            tracemalloc.start()
+        else:
+            for name in self.HOOKED:
+                self.saved[name] = getattr(Frame, name)
+                setattr(Frame, name, self.hook(name, self.saved[name]))
+        if format == "pstats":
+            import cProfile
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+
+    def hook(self, name, func):
+        calls = self.calls
+
+        def hooked(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                entry = calls.setdefault((self.current, name), [0, 0.])
+                entry[0] += 1
+                entry[1] += perf_counter() - start
+        hooked.__name__ = func.__name__
+        return hooked
+
+    def end_section(self):
+        if self.current is None:
+            return None
+        elapsed = perf_counter() - self.started
+        self.totals[self.current] = elapsed
+        if self.tracemalloc is not None:
+            current, peak = self.tracemalloc.get_traced_memory()
+            self.memory[self.current] = (current - self.memory[self.current],
+                                         peak - self.memory[self.current])
+        self.current = None
+
+    def section(self, name):
+        if self.output is None:
+            return None
+        self.end_section()
+        self.current = name
+        self.order.append(name)
+        if self.tracemalloc is not None:
+            if hasattr(self.tracemalloc, "reset_peak"):
+                self.tracemalloc.reset_peak()
+            self.memory[name] = self.tracemalloc.get_traced_memory()[0]
+        self.started = perf_counter()
+
+    def finish(self):
+        if self.output is None:
+            return None
+        self.end_section()
+        if self.profile is not None:
+            self.profile.disable()
+        if self.tracemalloc is not None:
+            self.tracemalloc.stop()
+        for name, func in self.saved.items():
+            setattr(Frame, name, func)
+        if self.format == "pstats":
+            self.profile.dump_stats(self.output)
+        elif self.output == "-":
+            self.write(stderr)
+        else:
+            with open(self.output, "w") as file:
+                self.write(file)
+
+    def write(self, file):
+        if self.format == "collapsed":
+            for section in self.order:
+                rest = self.totals[section]
+                for name in self.HOOKED:
+                    if (section, name) in self.calls:
+                        spent = self.calls[section, name][1]
+                        rest -= spent
+                        print("build;{0};Frame.{1} {2}".format(
+                            section, name, round(spent * 1e6)), file=file)
+                print("build;{0} {1}".format(section, round(max(0, rest)*1e6)),
+                      file=file)
+            return None
+        for section in self.order:
+            if section in self.memory:
+                net, peak = self.memory[section]
+                print("{0:<12}{1:>10.1f} ms  net {2:>+9.1f} KiB  peak "
+                      "{3:>8.1f} KiB".format(section,
+                                             self.totals[section] * 1000,
+                                             net / 1024, peak / 1024),
+                      file=file)
+            else:
+                print("{0:<12}{1:>10.1f} ms".format(
+                    section, self.totals[section] * 1000), file=file)
+            for name in self.HOOKED:
+                if (section, name) in self.calls:
+                    calls, spent = self.calls[section, name]
+                    print("  Frame.{0:<12}{1:>6} calls{2:>10.1f} ms{3:>10.1f} "
+                          "us/call".format(name, calls, spent * 1000,
+                                           spent * 1e6 / calls), file=file)
+        print("{0:<12}{1:>10.1f} ms".format(
+            "TOTAL", sum(self.totals.values()) * 1000), file=file)
+
+
+class BuildCache:
+    VERSION = 1
+    SECTION = re.compile(r'PROFILER\.section\("(\w+)"\)\n(.*?)'
+                         r'(?=PROFILER\.section\(|\Z)', re.S)
+
+    def __init__(self, directory, limit, backend):
+        self.directory = directory
+        self.limit = limit
+        self.backend = backend
+        self.path = None
+        self.building = True
+        self.engine = b""
+        self.sections = {}
+        if directory is None:
+            return None
+        os.makedirs(directory, exist_ok=True)
+        with open(__file__, encoding="utf-8") as file:
+            engine, _, score = file.read().partition("\nFPS = ")
+        self.engine = engine.encode("utf-8")
+        for match in self.SECTION.finditer(score):
+            self.sections[match.group(1)] = match.group(2)
+
+    def key(self, name, first, last, frames, lanes, anims, style):
+        backend = self.backend
+        slots = range((first-1)<<2, (last-1)<<2)
+        inputs = (
+            self.VERSION, name, self.sections.get(name),
+            type(backend).__name__, backend.rows is not None,
+            backend.snapshots is not None, backend.timeline is not None,
+            backend.note_x,
+            [(frame.snapshot(), frame.viewport is not None)
+             for frame in frames],
+            [[lane[slot] for slot in slots] for lane in lanes],
+            anims, style
+        )
+        digest = hashlib.sha1(self.engine)
+        digest.update(repr(inputs).encode("utf-8"))
+        return digest.hexdigest()
+
+    def range(self, name, first, last, frames, lanes, anims=None,
+              style=None):
+        self.building = True
+        for lane in lanes:
+            if isinstance(lane, Lane):
+                lane.built.update(range((first-1)<<2, (last-1)<<2))
+        if self.directory is None:
+            return range(first, last)
+        path = os.path.join(self.directory, "{0}-{1}.pickle".format(
+            name, self.key(name, first, last, frames, lanes, anims, style)))
+        try:
+            with open(path, "rb") as file:
+                records = pickle.load(file)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            self.path = path
+            self.backend.log = []
+            return range(first, last)
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        for record in records:
+            self.backend.append(record)
+        self.building = False
+        return range(0)
+
+    def store(self):
+        if self.path is None:
+            return None
+        path, self.path = self.path, None
+        records, self.backend.log = self.backend.log, None
+        temp = "{0}.{1}.tmp".format(path, os.getpid())
+        try:
+            with open(temp, "wb") as file:
+                pickle.dump(records, file, pickle.HIGHEST_PROTOCOL)
+            os.replace(temp, path)
+        except OSError:
+            if os.path.exists(temp):
+                os.remove(temp)
+            return None
+        self.evict()
+
+    def evict(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".pickle"):
+                info = entry.stat()
+                entries.append((info.st_mtime, info.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.limit:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+
 FPS = 4.0
 
-FRAME_STRS = []
+parser = argparse.ArgumentParser(
+    prog="PV of Alphabet",
+    description="This program outputs the frames of the PV of the song."
+)
+parser.add_argument(
+    "--score", metavar="MIDI",
+    help="Import the note and lyric lanes from a Standard MIDI File whose "
+         "track names match the lanes, such as MUSIC_HI or VOCAL_PT1; only "
+         "the first event of each quarter note within the 32 bars of the PV "
+         "is drawn, and the others are reported on stderr"
+)
+parser.add_argument(
+    "--scroll", action="store_true",
+    help="Scroll the note and lyric lanes with the playhead instead of "
+         "clipping them at the right edge of the screen"
+)
+parser.add_argument(
+    "--banner", action="store_true",
+    help="Draw the closing FULL COMBO! as a banner in the small bitmap font "
+         "instead of a line of text"
+)
+parser.add_argument(
+    "-s", "--skip-frames", help="Skip foremost N frames", type=int
+)
+parser.add_argument(
+    "-f", "--fps", help="Override the FPS (default: {0})".format(FPS),
+    type=float
+)
+parser.add_argument(
+    "-o", "--output", action="append", metavar="TARGET",
+    help="Write the frames to TARGET, which is a TTY path, a file descriptor "
+         "number or - for stdout (can be given several times; stdout is "
+         "written without blocking, dropping frames it lags behind on, "
+         "unless it is the only output)"
+)
+parser.add_argument(
+    "-p", "--playlist", nargs="+", metavar="PV",
+    help="Play the given PV scripts after this one without gaps, building "
+         "each of them in the background while the previous one plays"
+)
+parser.add_argument(
+    "--overlay-fps", type=float, metavar="HZ",
+    help="Between the stored frames, draw a beat progress bar, a moving "
+         "playhead and lyric highlight sweeps HZ times per second"
+)
+parser.add_argument(
+    "-a", "--adaptive", action="store_true",
+    help="Adapt to the measured bandwidth of each output by sending only "
+         "changed rows, dropping colors and skipping frames when needed"
+)
+parser.add_argument(
+    "--verify", type=int, choices=range(len(RowEncoder.LEVELS)),
+    metavar="LEVEL",
+    help="Encode every frame at the given output LEVEL ({0}) into an "
+         "in-process terminal model at full speed, compare it with the "
+         "built frames and report the bytes and escapes per frame".format(
+             ", ".join("{0}: {1}".format(level, name) for level, name
+                       in enumerate(RowEncoder.LEVELS)))
+)
+parser.add_argument(
+    "--verify-stats", metavar="FILE",
+    help="Write the bytes, escapes and differing cells of each frame "
+         "checked by --verify to FILE as CSV"
+)
+parser.add_argument(
+    "-C", "--capabilities", action="store_true",
+    help="Show the detected terminal capabilities of each output and exit"
+)
+parser.add_argument(
+    "--profile-build", nargs="?", const="-", metavar="FILE",
+    help="Profile the building of the frames and write the result to FILE "
+         "(default: stderr)"
+)
+parser.add_argument(
+    "--profile-format", choices=("report", "pstats", "collapsed"),
+    default="report",
+    help="Format of the build profile: a per-section report, a cProfile "
+         "dump or collapsed stacks for flame graphs (default: report)"
+)
+parser.add_argument(
+    "--profile-memory", action="store_true",
+    help="Trace the memory allocated by each section of the build profile "
+         "instead of timing the calls to Frame, in a separate run as "
+         "tracing slows the build down"
+)
+parser.add_argument(
+    "--backend", choices=("string", "numpy"), default="string",
+    help="Build the frames directly as strings or as a NumPy tensor of all "
+         "frames with their change masks, which is slower and meant for "
+         "--export-masks and analysis (default: string)"
+)
+parser.add_argument(
+    "--export-masks", metavar="FILE",
+    help="Save the frame tensor and the per-frame change masks to FILE as "
+         "a NumPy .npz archive (implies --backend numpy)"
+)
+parser.add_argument(
+    "--build-cache", nargs="?", metavar="DIR",
+    const=os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                       ".build-cache"),
+    help="Reuse the frames of each section from earlier builds kept in DIR "
+         "and rebuild only the sections whose inputs have changed (default: "
+         ".build-cache beside this program)"
+)
+parser.add_argument(
+    "--build-cache-size", type=float, default=64., metavar="MIB",
+    help="Evict the least recently used sections when the build cache "
+         "grows beyond MIB mebibytes (default: 64)"
+)
+parser.add_argument(
+    "-V", "--version", help="Show version info of this program",
+    action="store_true"
+)
+
+args = parser.parse_args(None if __name__ == "__main__"
+                         else globals().get("PLAYLIST_ARGV", []))
+
+if args.version:
+    print("""\
+PV of Alphabet
+Program: REGE (GitHub: IAmREGE  bilibili: 523423693)""")
+    from sys import exit
+    exit(0)
+
+if args.profile_format == "pstats" and args.profile_build == "-":
+    parser.error("--profile-format pstats requires a FILE for "
+                 "--profile-build")
+if args.profile_memory and args.profile_build is None:
+    args.profile_build = "-"
+PROFILER = BuildProfiler(args.profile_build, args.profile_format,
+                         args.profile_memory)
+if args.backend == "numpy" or args.export_masks:
+    try:
+        BACKEND = TensorBackend(
+            args.adaptive or bool(args.verify),
+            args.verify is not None or bool(args.overlay_fps),
+            bool(args.overlay_fps)
+        )
+    except ImportError:
+        parser.error("the numpy backend requires NumPy")
+else:
+    BACKEND = StringBackend(
+        args.adaptive or bool(args.verify),
+        args.verify is not None or bool(args.overlay_fps),
+        bool(args.overlay_fps)
+    )
+try:
+    BUILD_CACHE = BuildCache(args.build_cache,
+                             args.build_cache_size * 1048576, BACKEND)
+except OSError as exc:
+    parser.error("cannot use build cache {0}: {1}".format(args.build_cache,
+                                                          exc))
+
+PROFILER.section("BASE")
 
 FRAME_BASE = Frame()
 FRAME_BASE.fill_units("Music", 2, 1, 1)
 FRAME_BASE.fill_units("Vocal", 2, 3, 3)
 FRAME_BASE.fill_units("Music", 2, 7, 2)
+if args.scroll:
+    FRAME_BASE.viewport = Viewport(range(1, 8), 9, Frame.WIDTH)
 
 FRAME_INTRO = FRAME_BASE.copy()
 FRAME_INTRO.fill_units("TITLE: Alphabet", 14, 18, 7)
@@ -153,21 +1747,19 @@ FRAME_INTRO_V1 = FRAME_INTRO.copy()
 FRAME_INTRO_V2 = FRAME_INTRO.copy()
 FRAME_INTRO_V3 = FRAME_INTRO.copy()
 for k, v in (
-    (FRAME_INTRO,    {"A": (None, 6), "B": (None, 1), "C": (None, 13)}),
-    (FRAME_INTRO_V1, {"A": (None, 9), "B": (None, 1), "C": (None, 13)}),
-    (FRAME_INTRO_V2, {"A": (None, 6), "B": (None, 9), "C": (None, 13)}),
-    (FRAME_INTRO_V3, {"A": (None, 6), "B": (None, 1), "C": (None, 9)})
+    (FRAME_INTRO,    ((None, 6), (None, 1), (None, 13))),
+    (FRAME_INTRO_V1, ((None, 9), (None, 1), (None, 13))),
+    (FRAME_INTRO_V2, ((None, 6), (None, 9), (None, 13))),
+    (FRAME_INTRO_V3, ((None, 6), (None, 1), (None, 9)))
 ):
+    k.fill_style(*BIG_FONT.rasterize("ABC", v), 9, 9)
     k.fill_style("""\
-   AAA     BBBBBBB       CCCCC
-  AA AA    BB    BB    CCC   CC
- AA   AA   BB   BB    CC
-AA     AA  BBBBBB     CC              AAA   AAA   AAAB    BBB
-AAAAAAAAA  BB   BBB   CC             A     A   A  A   B  B   B
-AA     AA  BB     BB  CC              AC   A   C  C   C  B   B
-AA     AA  BB    BB    CCC   CC         C  C   C  C   C   BCCC
-AA     AA  BBBBBBB       CCCCC       CCC    CCC   C   C      C
-                                                         CCCC""", v, 9, 9)
+ AAA   AAA   AAAB    BBB
+A     A   A  A   B  B   B
+ AC   A   C  C   C  B   B
+   C  C   C  C   C   BCCC
+CCC    CCC   C   C      C
+                    CCCC""", {"A": v[0], "B": v[1], "C": v[2]}, 46, 12)
 MUSIC_HI_NOTES = (
     1, None, 1, None, 5, None, 5, None, 6, None, 6, None, 5, None, 5, None,
     4, None, 4, None, 3, None, 3, None, 2, None, 2, 3, 1, None, None, None,
@@ -277,9 +1869,32 @@ VOCAL_PT4_1_LYRICS = (
     "Next", None, "time", None, "would", None, "you", None, "sing", None,
     "with", None, "me", None, None, None
 )
+if args.score:
+    IMPORTER = ScoreImporter(args.score)
+    try:
+        LANES = IMPORTER.read()
+    except (OSError, ValueError) as exc:
+        parser.error("cannot import score {0}: {1}".format(args.score, exc))
+    for name, count in sorted(IMPORTER.collisions.items()):
+        print("score {0}: {1}: dropped {2} events sharing a quarter with an "
+              "earlier one".format(args.score, name, count), file=stderr)
+    MUSIC_HI_NOTES = LANES.get("MUSIC_HI_NOTES", MUSIC_HI_NOTES)
+    MUSIC_LO_NOTES = LANES.get("MUSIC_LO_NOTES", MUSIC_LO_NOTES)
+    VOCAL_PT1_NOTES = LANES.get("VOCAL_PT1_NOTES", VOCAL_PT1_NOTES)
+    VOCAL_PT2_NOTES = LANES.get("VOCAL_PT2_NOTES", VOCAL_PT2_NOTES)
+    VOCAL_PT3_NOTES = LANES.get("VOCAL_PT3_NOTES", VOCAL_PT3_NOTES)
+    VOCAL_PT1_LYRICS = LANES.get("VOCAL_PT1_LYRICS", VOCAL_PT1_LYRICS)
+    VOCAL_PT2_LYRICS = LANES.get("VOCAL_PT2_LYRICS", VOCAL_PT2_LYRICS)
+    VOCAL_PT3_LYRICS = LANES.get("VOCAL_PT3_LYRICS", VOCAL_PT3_LYRICS)
+    VOCAL_PT4_1_LYRICS = LANES.get("VOCAL_PT4_1_LYRICS", VOCAL_PT4_1_LYRICS)
+PROFILER.section("INTRO")
 this_frame = FRAME_INTRO
 note_x = 9
-for sec in range(1, 9):
+for sec in BUILD_CACHE.range(
+    "INTRO", 1, 9,
+    (FRAME_INTRO, FRAME_INTRO_V1, FRAME_INTRO_V2, FRAME_INTRO_V3),
+    (MUSIC_HI_NOTES, MUSIC_LO_NOTES)
+):
     for half in range(2):
         for quarter in range(2):
             this_frame = FRAME_INTRO
@@ -303,25 +1918,11 @@ for sec in range(1, 9):
                     this_frame = FRAME_INTRO_V3
             elif sec == 7:
                 if half:
-                    this_frame.fill_style("""\
- 2222222X
-22     22
-      22X
-    222 X
-  222   X
- 22     X
-22      X
-222222222""", {"2": (None, 1), " ": (None, 9), "X": (None, 9)}, 20, 9)
+                    this_frame.fill_style(*BIG_FONT.rasterize(
+                        "2", ((None, 1),), (None, 9)), 20, 9)
                 else:
-                    this_frame.fill_style("""\
- 3333333X
-33     33
-      33X
-   3333 X
-      33X
-       33
-33    33X
- 333333 X""", {"3": (None, 6), " ": (None, 9), "X": (None, 9)}, 9, 9)
+                    this_frame.fill_style(*BIG_FONT.rasterize(
+                        "3", ((None, 6),), (None, 9)), 9, 9)
             elif sec == 8:
                 if half:
                     this_frame.fill_style("""\
@@ -335,22 +1936,20 @@ CCCC           CC  CC  CC""", {
     "X": (None, 9)
 }, 46, 12)
                 else:
-                    this_frame.fill_style("""\
-   11   X
- 11 1   X
-1   1   X
-    1   X
-    1   X
-    1   X
-    1   X
-111111111""", {"1": (None, 13), " ": (None, 9), "X": (None, 9)}, 31, 9)
+                    this_frame.fill_style(*BIG_FONT.rasterize(
+                        "1", ((None, 13),), (None, 9)), 31, 9)
             this_frame.fill_units("{0}.{1}".format(sec, half+1).rjust(5),
                                   72, 22, 1)
-            FRAME_STRS.append(this_frame.get_string())
+            BACKEND.emit(this_frame, note_x)
+BUILD_CACHE.store()
+PROFILER.section("PT1_PH1")
 FRAME_PT1_PH1 = FRAME_BASE.copy()
 this_frame = FRAME_PT1_PH1
 note_x = 9
-for sec in range(9, 25):
+for sec in BUILD_CACHE.range(
+    "PT1_PH1", 9, 25, (FRAME_PT1_PH1,),
+    (MUSIC_HI_NOTES, VOCAL_PT1_NOTES, VOCAL_PT1_LYRICS, MUSIC_LO_NOTES)
+):
     for half in range(2):
         for quarter in range(2):
             this_hi_note = MUSIC_HI_NOTES[((sec-1)<<2)|(half<<1)|quarter]
@@ -373,14 +1972,19 @@ for sec in range(9, 25):
                     if this_lo_note > 7:
                         this_frame.fill_units(".", note_x, 6, 2)
                 note_x += 2 if this_vocal_lyrics is None else \
-                    max(1, len(this_vocal_lyrics)) + 1
+                    max(1, Frame.text_width(this_vocal_lyrics)) + 1
             this_frame.fill_units("{0}.{1}".format(sec, half+1).rjust(5),
                                   72, 22, 1)
-            FRAME_STRS.append(this_frame.get_string())
+            BACKEND.emit(this_frame, note_x)
+BUILD_CACHE.store()
+PROFILER.section("PT1_PH2")
 FRAME_PT1_PH2 = FRAME_BASE.copy()
 this_frame = FRAME_PT1_PH2
 note_x = 9
-for sec in range(25, 33):
+for sec in BUILD_CACHE.range(
+    "PT1_PH2", 25, 33, (FRAME_PT1_PH2,),
+    (MUSIC_HI_NOTES, VOCAL_PT1_NOTES, VOCAL_PT1_LYRICS, MUSIC_LO_NOTES)
+):
     for half in range(2):
         for quarter in range(2):
             this_hi_note = MUSIC_HI_NOTES[((sec-1)<<2)|(half<<1)|quarter]
@@ -405,10 +2009,12 @@ for sec in range(25, 33):
                     if this_lo_note > 7:
                         this_frame.fill_units(".", note_x, 6, 2)
                 note_x += 2 if this_vocal_lyrics is None else \
-                    max(1, len(this_vocal_lyrics)) + 1
+                    max(1, Frame.text_width(this_vocal_lyrics)) + 1
             this_frame.fill_units("{0}.{1}".format(sec, half+1).rjust(5),
                                   72, 22, 1)
-            FRAME_STRS.append(this_frame.get_string())
+            BACKEND.emit(this_frame, note_x)
+BUILD_CACHE.store()
+PROFILER.section("PT2_BREAK")
 FRAME_PT2_BREAK = FRAME_BASE.copy()
 FRAME_PT2_ANIMS = (
     ("Password: A|", 28, 12, 7, 0),
@@ -430,7 +2036,11 @@ FRAME_PT2_ANIMS = (
 )
 this_frame = FRAME_PT2_BREAK
 note_x = 9
-for sec in range(1, 9):
+for sec in BUILD_CACHE.range(
+    "PT2_BREAK", 1, 9, (FRAME_PT2_BREAK,),
+    (MUSIC_HI_NOTES, MUSIC_LO_NOTES),
+    anims=FRAME_PT2_ANIMS, style=NOTE_TO_SAYING
+):
     for half in range(2):
         this_frame.fill_units(*FRAME_PT2_ANIMS[((sec-1)<<1)|half])
         for quarter in range(2):
@@ -449,11 +2059,17 @@ for sec in range(1, 9):
                               else len(NOTE_TO_SAYING[this_lo_note%7])) + 1
             this_frame.fill_units("{0}.{1}".format(sec+32, half+1).rjust(5),
                                   72, 22, 1)
-            FRAME_STRS.append(this_frame.get_string())
+            BACKEND.emit(this_frame, note_x)
+BUILD_CACHE.store()
+PROFILER.section("PT2_PH1")
 FRAME_PT2_PH1 = FRAME_BASE.copy()
 this_frame = FRAME_PT2_PH1
 note_x = 9
-for sec in range(9, 17):
+for sec in BUILD_CACHE.range(
+    "PT2_PH1", 9, 17, (FRAME_PT2_PH1,),
+    (MUSIC_HI_NOTES, VOCAL_PT2_NOTES, VOCAL_PT2_LYRICS, MUSIC_LO_NOTES),
+    style=NOTE_TO_SAYING
+):
     for half in range(2):
         for quarter in range(2):
             this_hi_note = MUSIC_HI_NOTES[((sec-1)<<2)|(half<<1)|quarter]
@@ -478,16 +2094,22 @@ for sec in range(9, 17):
                               0 if this_vocal_note is None
                               else len(NOTE_TO_SAYING[this_vocal_note%7]),
                               0 if this_vocal_lyrics is None
-                              else len(this_vocal_lyrics),
+                              else Frame.text_width(this_vocal_lyrics),
                               0 if this_lo_note is None
                               else len(NOTE_TO_SAYING[this_lo_note%7])) + 1
             this_frame.fill_units("{0}.{1}".format(sec+32, half+1).rjust(5),
                                   72, 22, 1)
-            FRAME_STRS.append(this_frame.get_string())
+            BACKEND.emit(this_frame, note_x)
+BUILD_CACHE.store()
+PROFILER.section("PT2_PH2")
 FRAME_PT2_PH2 = FRAME_BASE.copy()
 this_frame = FRAME_PT2_PH2
 note_x = 9
-for sec in range(17, 25):
+for sec in BUILD_CACHE.range(
+    "PT2_PH2", 17, 25, (FRAME_PT2_PH2,),
+    (MUSIC_HI_NOTES, VOCAL_PT2_NOTES, VOCAL_PT2_LYRICS, MUSIC_LO_NOTES),
+    style=NOTE_TO_SAYING
+):
     for half in range(2):
         for quarter in range(2):
             this_hi_note = MUSIC_HI_NOTES[((sec-1)<<2)|(half<<1)|quarter]
@@ -512,16 +2134,22 @@ for sec in range(17, 25):
                               0 if this_vocal_note is None
                               else len(NOTE_TO_SAYING[this_vocal_note%7]),
                               0 if this_vocal_lyrics is None
-                              else len(this_vocal_lyrics),
+                              else Frame.text_width(this_vocal_lyrics),
                               0 if this_lo_note is None
                               else len(NOTE_TO_SAYING[this_lo_note%7])) + 1
             this_frame.fill_units("{0}.{1}".format(sec+32, half+1).rjust(5),
                                   72, 22, 1)
-            FRAME_STRS.append(this_frame.get_string())
+            BACKEND.emit(this_frame, note_x)
+BUILD_CACHE.store()
+PROFILER.section("PT2_PH3")
 FRAME_PT2_PH3 = FRAME_BASE.copy()
 this_frame = FRAME_PT2_PH3
 note_x = 9
-for sec in range(25, 33):
+for sec in BUILD_CACHE.range(
+    "PT2_PH3", 25, 33, (FRAME_PT2_PH3,),
+    (MUSIC_HI_NOTES, VOCAL_PT2_NOTES, VOCAL_PT2_LYRICS, MUSIC_LO_NOTES),
+    style=NOTE_TO_SAYING
+):
     for half in range(2):
         for quarter in range(2):
             this_hi_note = MUSIC_HI_NOTES[((sec-1)<<2)|(half<<1)|quarter]
@@ -546,16 +2174,22 @@ for sec in range(25, 33):
                               0 if this_vocal_note is None
                               else len(NOTE_TO_SAYING[this_vocal_note%7]),
                               0 if this_vocal_lyrics is None
-                              else len(this_vocal_lyrics),
+                              else Frame.text_width(this_vocal_lyrics),
                               0 if this_lo_note is None
                               else len(NOTE_TO_SAYING[this_lo_note%7])) + 1
             this_frame.fill_units("{0}.{1}".format(sec+32, half+1).rjust(5),
                                   72, 22, 1)
-            FRAME_STRS.append(this_frame.get_string())
+            BACKEND.emit(this_frame, note_x)
+BUILD_CACHE.store()
+PROFILER.section("PT3_BREAK")
 FRAME_PT3_BREAK = FRAME_BASE.copy()
 this_frame = FRAME_PT3_BREAK
 note_x = 9
-for sec in range(1, 9):
+for sec in BUILD_CACHE.range(
+    "PT3_BREAK", 1, 9, (FRAME_PT3_BREAK,),
+    (MUSIC_HI_NOTES, MUSIC_LO_NOTES),
+    style=NOTE_TO_KEY
+):
     for half in range(2):
         for quarter in range(2):
             if half and not quarter:
@@ -581,7 +2215,9 @@ for sec in range(1, 9):
                               else len(NOTE_TO_KEY[this_lo_note-1])) + 1
             this_frame.fill_units("{0}.{1}".format(sec+64, half+1).rjust(5),
                                   72, 22, 1)
-            FRAME_STRS.append(this_frame.get_string())
+            BACKEND.emit(this_frame, note_x)
+BUILD_CACHE.store()
+PROFILER.section("PT3_PH1")
 FRAME_PT3_PH1 = FRAME_BASE.copy()
 FRAME_PT3_PH1_ANIMS = (
     ("A", 30, 12, 3), None,
@@ -606,7 +2242,11 @@ this_frame.fill_units("ABCDEFG\nHIJKLMN\nOPQ RST\nUVW XYZ", 10, 12, 4)
 this_frame.fill_units("|\n|\n|\n|", 18, 12, 7)
 this_frame.fill_units("ABCDEFG\nHIJKLMN\nOPQRSTU\nV W XYZ", 20, 12, 2)
 note_x = 9
-for sec in range(9, 17):
+for sec in BUILD_CACHE.range(
+    "PT3_PH1", 9, 17, (FRAME_PT3_PH1,),
+    (MUSIC_HI_NOTES, VOCAL_PT3_NOTES, VOCAL_PT3_LYRICS, MUSIC_LO_NOTES),
+    anims=FRAME_PT3_PH1_ANIMS, style=NOTE_TO_KEY
+):
     for half in range(2):
         for quarter in range(2):
             anim = FRAME_PT3_PH1_ANIMS[((sec-9)<<2)|(half<<1)|quarter]
@@ -634,12 +2274,14 @@ for sec in range(9, 17):
                               0 if this_vocal_note is None
                               else len(NOTE_TO_KEY[this_vocal_note+6]),
                               0 if this_vocal_lyrics is None
-                              else len(this_vocal_lyrics),
+                              else Frame.text_width(this_vocal_lyrics),
                               0 if this_lo_note is None
                               else len(NOTE_TO_KEY[this_lo_note-1])) + 1
             this_frame.fill_units("{0}.{1}".format(sec+64, half+1).rjust(5),
                                   72, 22, 1)
-            FRAME_STRS.append(this_frame.get_string())
+            BACKEND.emit(this_frame, note_x)
+BUILD_CACHE.store()
+PROFILER.section("PT3_PH2")
 FRAME_PT3_PH2 = FRAME_BASE.copy()
 FRAME_PT3_PH2_ANIMS = (
     ("Q", 30, 14, 3), None,
@@ -660,7 +2302,11 @@ this_frame.fill_units("ABCDEFG\nHIJKLMN\nOPQRSTU\nV W XYZ", 20, 12, 2)
 this_frame.fill_units("|\n|\n|\n|", 28, 12, 7)
 this_frame.fill_units("ABCDE F G\nHIJKLMNOP", 30, 12, 3)
 note_x = 9
-for sec in range(17, 25):
+for sec in BUILD_CACHE.range(
+    "PT3_PH2", 17, 25, (FRAME_PT3_PH2,),
+    (MUSIC_HI_NOTES, VOCAL_PT3_NOTES, VOCAL_PT3_LYRICS, MUSIC_LO_NOTES),
+    anims=FRAME_PT3_PH2_ANIMS, style=NOTE_TO_KEY
+):
     for half in range(2):
         for quarter in range(2):
             anim = FRAME_PT3_PH2_ANIMS[((sec-17)<<2)|(half<<1)|quarter]
@@ -688,12 +2334,14 @@ for sec in range(17, 25):
                               0 if this_vocal_note is None
                               else len(NOTE_TO_KEY[this_vocal_note+6]),
                               0 if this_vocal_lyrics is None
-                              else len(this_vocal_lyrics),
+                              else Frame.text_width(this_vocal_lyrics),
                               0 if this_lo_note is None
                               else len(NOTE_TO_KEY[this_lo_note-1])) + 1
             this_frame.fill_units("{0}.{1}".format(sec+64, half+1).rjust(5),
                                   72, 22, 1)
-            FRAME_STRS.append(this_frame.get_string())
+            BACKEND.emit(this_frame, note_x)
+BUILD_CACHE.store()
+PROFILER.section("PT3_PH3")
 FRAME_PT3_PH3 = FRAME_BASE.copy()
 this_frame = FRAME_PT3_PH3
 this_frame.fill_units("ABCDEFG\nHIJKLMN\nOPQ RST\nUVW XYZ", 10, 12, 4)
@@ -702,7 +2350,11 @@ this_frame.fill_units("ABCDEFG\nHIJKLMN\nOPQRSTU\nV W XYZ", 20, 12, 2)
 this_frame.fill_units("|\n|\n|\n|", 28, 12, 7)
 this_frame.fill_units("ABCDE F G\nHIJKLMNOP\nQRS T U V\nW X Y   Z", 30, 12, 3)
 note_x = 9
-for sec in range(25, 33):
+for sec in BUILD_CACHE.range(
+    "PT3_PH3", 25, 33, (FRAME_PT3_PH3,),
+    (MUSIC_HI_NOTES, VOCAL_PT3_NOTES, VOCAL_PT3_LYRICS, MUSIC_LO_NOTES),
+    style=NOTE_TO_KEY
+):
     for half in range(2):
         for quarter in range(2):
             this_hi_note = MUSIC_HI_NOTES[((sec-1)<<2)|(half<<1)|quarter]
@@ -727,12 +2379,14 @@ for sec in range(25, 33):
                               0 if this_vocal_note is None
                               else len(NOTE_TO_KEY[this_vocal_note+6]),
                               0 if this_vocal_lyrics is None
-                              else len(this_vocal_lyrics),
+                              else Frame.text_width(this_vocal_lyrics),
                               0 if this_lo_note is None
                               else len(NOTE_TO_KEY[this_lo_note-1])) + 1
             this_frame.fill_units("{0}.{1}".format(sec+64, half+1).rjust(5),
                                   72, 22, 1)
-            FRAME_STRS.append(this_frame.get_string())
+            BACKEND.emit(this_frame, note_x)
+BUILD_CACHE.store()
+PROFILER.section("PT4_BREAK")
 FRAME_PT3_BREAK = FRAME_BASE.copy()
 this_frame = FRAME_PT3_BREAK
 this_frame.fill_units("ABCDEFG\nHIJKLMN\nOPQ RST\nUVW XYZ", 10, 12, 4)
@@ -741,7 +2395,11 @@ this_frame.fill_units("ABCDEFG\nHIJKLMN\nOPQRSTU\nV W XYZ", 20, 12, 2)
 this_frame.fill_units("|\n|\n|\n|", 28, 12, 7)
 this_frame.fill_units("ABCDE F G\nHIJKLMNOP\nQRS T U V\nW X Y   Z", 30, 12, 3)
 note_x = 9
-for sec in range(1, 9):
+for sec in BUILD_CACHE.range(
+    "PT4_BREAK", 1, 9, (FRAME_PT3_BREAK,),
+    (MUSIC_HI_NOTES, MUSIC_LO_NOTES),
+    style=NOTE_TO_KEY
+):
     for half in range(2):
         for quarter in range(2):
             if not quarter:
@@ -777,7 +2435,9 @@ for sec in range(1, 9):
                               else len(NOTE_TO_KEY[this_lo_note-1])) + 1
             this_frame.fill_units("{0}.{1}".format(sec+96, half+1).rjust(5),
                                   72, 22, 1)
-            FRAME_STRS.append(this_frame.get_string())
+            BACKEND.emit(this_frame, note_x)
+BUILD_CACHE.store()
+PROFILER.section("PT4_PH1")
 FRAME_PT4_PH1 = FRAME_BASE.copy()
 FRAME_PT4_PH1_ANIMS = (
     ((" ", 10, 12, 9), (" ", 20, 12, 9), (" ", 30, 12, 9)), (),
@@ -804,7 +2464,11 @@ this_frame.fill_units("ABCDEFG\nHIJKLMN\nOPQRSTU\nV W XYZ", 20, 12, 2)
 this_frame.fill_units("|\n|\n|\n|", 28, 12, 7)
 this_frame.fill_units("ABCDE F G\nHIJKLMNOP\nQRS T U V\nW X Y   Z", 30, 12, 3)
 note_x = 9
-for sec in range(9, 17):
+for sec in BUILD_CACHE.range(
+    "PT4_PH1", 9, 17, (FRAME_PT4_PH1,),
+    (MUSIC_HI_NOTES, VOCAL_PT3_NOTES, VOCAL_PT3_LYRICS, MUSIC_LO_NOTES),
+    anims=FRAME_PT4_PH1_ANIMS, style=(NOTE_TO_SAYING, NOTE_TO_KEY)
+):
     for half in range(2):
         for quarter in range(2):
             for anim in FRAME_PT4_PH1_ANIMS[((sec-9)<<2)|(half<<1)|quarter]:
@@ -831,12 +2495,14 @@ for sec in range(9, 17):
                               0 if this_vocal_note is None
                               else len(NOTE_TO_SAYING[this_vocal_note%7]),
                               0 if this_vocal_lyrics is None
-                              else len(this_vocal_lyrics),
+                              else Frame.text_width(this_vocal_lyrics),
                               0 if this_lo_note is None
                               else len(NOTE_TO_KEY[this_lo_note-1])) + 1
             this_frame.fill_units("{0}.{1}".format(sec+96, half+1).rjust(5),
                                   72, 22, 1)
-            FRAME_STRS.append(this_frame.get_string())
+            BACKEND.emit(this_frame, note_x)
+BUILD_CACHE.store()
+PROFILER.section("PT4_PH2")
 FRAME_PT4_PH2 = FRAME_BASE.copy()
 FRAME_PT4_PH2_ANIMS = (
     (("    ", 10, 14, 9), ("   ", 20, 14, 9), (" ",    30, 14, 9)), (),
@@ -857,7 +2523,11 @@ this_frame.fill_units("  QRSTU\nV W XYZ", 20, 14, 2)
 this_frame.fill_units("|\n|\n|\n|", 28, 12, 7)
 this_frame.fill_units("QRS T U V\nW X Y   Z", 30, 14, 3)
 note_x = 9
-for sec in range(17, 25):
+for sec in BUILD_CACHE.range(
+    "PT4_PH2", 17, 25, (FRAME_PT4_PH2,),
+    (MUSIC_HI_NOTES, VOCAL_PT3_NOTES, VOCAL_PT3_LYRICS, MUSIC_LO_NOTES),
+    anims=FRAME_PT4_PH2_ANIMS, style=(NOTE_TO_SAYING, NOTE_TO_KEY)
+):
     for half in range(2):
         for quarter in range(2):
             for anim in FRAME_PT4_PH2_ANIMS[((sec-17)<<2)|(half<<1)|quarter]:
@@ -884,22 +2554,35 @@ for sec in range(17, 25):
                               0 if this_vocal_note is None
                               else len(NOTE_TO_SAYING[this_vocal_note%7]),
                               0 if this_vocal_lyrics is None
-                              else len(this_vocal_lyrics),
+                              else Frame.text_width(this_vocal_lyrics),
                               0 if this_lo_note is None
                               else len(NOTE_TO_KEY[this_lo_note-1])) + 1
             this_frame.fill_units("{0}.{1}".format(sec+96, half+1).rjust(5),
                                   72, 22, 1)
-            FRAME_STRS.append(this_frame.get_string())
+            BACKEND.emit(this_frame, note_x)
+BUILD_CACHE.store()
+PROFILER.section("PT4_PH3")
 FRAME_PT4_PH3 = FRAME_BASE.copy()
 this_frame = FRAME_PT4_PH3
 this_frame.fill_units("|\n|\n|\n|", 18, 12, 7)
 this_frame.fill_units("|\n|\n|\n|", 28, 12, 7)
 note_x = 9
-for sec in range(25, 33):
+for sec in BUILD_CACHE.range(
+    "PT4_PH3", 25, 33, (FRAME_PT4_PH3,),
+    (MUSIC_HI_NOTES, VOCAL_PT3_NOTES, VOCAL_PT4_1_LYRICS,
+         VOCAL_PT3_LYRICS, MUSIC_LO_NOTES),
+    style=(NOTE_TO_SAYING, NOTE_TO_KEY, args.banner)
+):
     for half in range(2):
         for quarter in range(2):
             if sec == 32 and half and not quarter:
-                this_frame.fill_units("FULL COMBO!", 18, 13, 4, 7)
+                if args.banner:
+                    banner, mapper = SMALL_FONT.rasterize(
+                        "FULL COMBO!", ((None, 4),), (None, 7))
+                    this_frame.fill_units(re.sub("\\S", " ", banner), 18, 12)
+                    this_frame.fill_style(banner, mapper, 18, 12)
+                else:
+                    this_frame.fill_units("FULL COMBO!", 18, 13, 4, 7)
             this_hi_note = MUSIC_HI_NOTES[((sec-1)<<2)|(half<<1)|quarter]
             this_vocal_note = VOCAL_PT3_NOTES[((sec-1)<<2)|(half<<1)|quarter]
             this_vocal_lyrics_1 = \
@@ -908,7 +2591,8 @@ for sec in range(25, 33):
                 VOCAL_PT3_LYRICS[((sec-1)<<2)|(half<<1)|quarter]
             this_lo_note = MUSIC_LO_NOTES[((sec-1)<<2)|(half<<1)|quarter]
             if this_hi_note is not None or this_vocal_note is not None or \
-                this_vocal_lyrics is not None or this_lo_note is not None:
+                this_vocal_lyrics_1 is not None or \
+                this_vocal_lyrics_2 is not None or this_lo_note is not None:
                 if this_hi_note is not None:
                     this_frame.fill_units(str((this_hi_note-1)%7+1),
                                           note_x, 1, 1)
@@ -926,53 +2610,202 @@ for sec in range(25, 33):
                               0 if this_vocal_note is None
                               else len(NOTE_TO_SAYING[this_vocal_note%7]),
                               0 if this_vocal_lyrics_1 is None
-                              else len(this_vocal_lyrics_1),
+                              else Frame.text_width(this_vocal_lyrics_1),
                               0 if this_vocal_lyrics_2 is None
-                              else len(this_vocal_lyrics_2),
+                              else Frame.text_width(this_vocal_lyrics_2),
                               0 if this_lo_note is None
                               else len(NOTE_TO_KEY[this_lo_note-1])) + 1
             this_frame.fill_units("{0}.{1}".format(sec+96, half+1).rjust(5),
                                   72, 22, 1)
-            FRAME_STRS.append(this_frame.get_string())
-this_frame.fill_units("Fine.", 72, 22, 1)
-FRAME_STRS.append(this_frame.get_string())
+            BACKEND.emit(this_frame, note_x)
+if BUILD_CACHE.building:
+    this_frame.fill_units("Fine.", 72, 22, 1)
+    BACKEND.emit(this_frame, note_x)
+BUILD_CACHE.store()
+PROFILER.section("ENCODE")
+FRAME_STRS = BACKEND.finish()
+if args.score:
+    # the PV only has the quarters of its own bars to draw events in
+    for name, lane in sorted(LANES.items()):
+        outside = sorted(set(lane) - lane.built)
+        if outside:
+            print("score {0}: {1}: dropped {2} events outside the bars of "
+                  "the PV, the first at bar {3}".format(
+                      args.score, name, len(outside), (outside[0] >> 2) + 1
+                  ), file=stderr)
+FRAME_ROWS = BACKEND.rows
+FRAME_SNAPSHOTS = BACKEND.snapshots
+FRAME_TIMELINE = BACKEND.timeline
+PROFILER.finish()
+if args.export_masks:
+    BACKEND.export(args.export_masks)
 
-parser = argparse.ArgumentParser(
-    prog="PV of Alphabet",
-    description="This program outputs the frames of the PV of the song."
-)
-parser.add_argument(
-    "-s", "--skip-frames", help="Skip foremost N frames", type=int
-)
-parser.add_argument(
-    "-f", "--fps", help="Override the FPS (default: {0})".format(FPS),
-    type=float
-)
-parser.add_argument(
-    "-V", "--version", help="Show version info of this program",
-    action="store_true"
-)
+if __name__ == "__main__":
+    if args.skip_frames:
+        del FRAME_STRS[:args.skip_frames]
+        if FRAME_ROWS is not None:
+            del FRAME_ROWS[:args.skip_frames]
+        if FRAME_SNAPSHOTS is not None:
+            del FRAME_SNAPSHOTS[:args.skip_frames]
+        if FRAME_TIMELINE is not None:
+            del FRAME_TIMELINE[:args.skip_frames]
 
-args = parser.parse_args()
+    if args.verify is not None:
+        sink = VTSink(args.verify)
+        failed = 0
+        prelis = []
+        # the frames are encoded again from their snapshots to time the
+        # encoder itself, with the rows left as they were cached as in the
+        # build
+        frame = Frame()
+        start_time = perf_counter()
+        for count, body in enumerate(FRAME_STRS):
+            frame.load(FRAME_SNAPSHOTS[count])
+            start = perf_counter()
+            frame.get_string()
+            if args.verify:
+                frame.get_rows()
+            sink.encoding += perf_counter() - start
+            text = "\033[H" + body
+            rows = None if FRAME_ROWS is None else FRAME_ROWS[count]
+            sink.push(text, text.encode(), rows)
+            differ = sink.screen.compare(FRAME_SNAPSHOTS[count],
+                                         args.verify < 2)
+            if differ:
+                failed += 1
+                if failed <= 5:
+                    x, y = differ[0]
+                    unit = sink.screen.units[y][x]
+                    chars, fores, backs = FRAME_SNAPSHOTS[count][y]
+                    print("frame {0}: {1} cells differ, first at row {2} "
+                          "column {3}: expected {4!r} ({5}, {6}), got {7!r} "
+                          "({8}, {9})".format(
+                              count, len(differ), y, x, chars[x], fores[x],
+                              backs[x], unit.char, unit.fore, unit.back
+                          ), file=stderr)
+            prelis.append((len(differ),) + sink.stats[-1])
+        elapsed = perf_counter() - start_time
+        if args.verify_stats:
+            with open(args.verify_stats, "w") as file:
+                print("frame,bytes,escapes,differing_cells", file=file)
+                for count, (differ, size, escapes) in enumerate(prelis):
+                    print("{0},{1},{2},{3}".format(count, size, escapes,
+                                                   differ), file=file)
+        total = max(1, len(prelis))
+        sizes = [size for _, size, _ in prelis]
+        escapes = [escape for _, _, escape in prelis]
+        print("{0} frames checked at level {1} ({2}), {3} mismatched".format(
+            len(prelis), args.verify, RowEncoder.LEVELS[args.verify], failed
+        ), file=stderr)
+        print("bytes: {0} total, {1:.1f} per frame, {2} max".format(
+            sum(sizes), sum(sizes) / total, max(sizes, default=0)
+        ), file=stderr)
+        print("escapes: {0} total, {1:.1f} per frame, {2} max, {3} "
+              "unknown".format(sum(escapes), sum(escapes) / total,
+                               max(escapes, default=0), sink.screen.unknown),
+              file=stderr)
+        print("encoding: {0:.1f} ms ({1:.0f} frames/s), with emulation: "
+              "{2:.1f} ms".format(sink.encoding * 1000,
+                                  len(prelis) / max(sink.encoding, 1e-9),
+                                  elapsed * 1000), file=stderr)
+        from sys import exit
+        exit(1 if failed else 0)
 
-if args.version:
-    print("""\
-PV of Alphabet
-Program: REGE (GitHub: IAmREGE  bilibili: 523423693)""")
-    from sys import exit
-    exit(0)
+    SPF = 1. / (FPS if args.fps is None else args.fps)
+    SINKS = []
+    try:
+        # stdout only blocks when it is the one output, as a slow stdout
+        # must not hold the other outputs back
+        for target in args.output or ("-",):
+            if args.adaptive:
+                SINKS.append(AdaptiveSink(target, SPF))
+            elif target == "-" and len(args.output or ()) < 2:
+                SINKS.append(StreamSink(stdout))
+            else:
+                SINKS.append(FdSink(target))
+    except OSError as exc:
+        for sink in SINKS:
+            sink.close()
+        parser.error("cannot open output {0}: {1}".format(target,
+                                                          exc.strerror))
 
-if args.skip_frames:
-    del FRAME_STRS[:args.skip_frames]
+    if args.capabilities:
+        for sink in SINKS:
+            sink.close()
+            print("{0}: {1}".format(sink.name, sink.caps.describe()))
+        from sys import exit
+        exit(0)
 
-SPF = 1. / (FPS if args.fps is None else args.fps)
-start_time = monotonic()
-count = 0
-try:
-    for count, body in enumerate(FRAME_STRS, start=1):
-        print("\033[H", end=body, flush=True)
-        while monotonic() - start_time < SPF * count:
-            sleep(0.001)
-except KeyboardInterrupt:
-    print("1 frame presented" if count == 1
-          else "{0} frames presented".format(count), file=stderr)
\ No newline at end of file
+    # PVs played after this one keep their rows for --adaptive as well
+    PLAYLIST = Playlist(args.playlist or (),
+                        ["--adaptive"] if args.adaptive else [])
+    if args.overlay_fps:
+        overlay = Overlay(FRAME_TIMELINE, FRAME_SNAPSHOTS,
+                          args.skip_frames or 0)
+    else:
+        overlay = None
+    frame_strs, frame_rows, spf = FRAME_STRS, FRAME_ROWS, SPF
+    deadline = monotonic()
+    count = 0
+    try:
+        while frame_strs is not None:
+            PLAYLIST.prefetch()
+            for index, body in enumerate(frame_strs):
+                if all(sink.failed is not None for sink in SINKS):
+                    break
+                text = "\033[H" + body
+                data = text.encode()
+                rows = None if frame_rows is None else frame_rows[index]
+                for sink in SINKS:
+                    sink.push(text, data, rows)
+                count += 1
+                ticks = 1 if overlay is None else \
+                    max(1, int(spf * args.overlay_fps))
+                for tick in range(ticks):
+                    while monotonic() < deadline + spf * tick / ticks:
+                        for sink in SINKS:
+                            sink.flush()
+                        sleep(0.001)
+                    if overlay is not None:
+                        overlay.draw(index, tick / ticks, SINKS)
+                deadline += spf
+                while monotonic() < deadline:
+                    for sink in SINKS:
+                        sink.flush()
+                    sleep(0.001)
+            if all(sink.failed is not None for sink in SINKS):
+                break
+            if overlay is not None:
+                overlay.clear(SINKS)
+            path, loaded = PLAYLIST.next()
+            if loaded is None:
+                break
+            frame_strs, frame_rows, overlay = loaded[0], loaded[1], None
+            spf = 1. / (loaded[2] if args.fps is None else args.fps)
+            for sink in SINKS:
+                if isinstance(sink, AdaptiveSink):
+                    sink.spf = spf
+            stall = monotonic() - deadline
+            if stall > spf:
+                print("waited {0:.0f} ms for PV {1}".format(stall * 1000,
+                                                            path),
+                      file=stderr)
+                deadline += stall
+    except KeyboardInterrupt:
+        print("1 frame presented" if count == 1
+              else "{0} frames presented".format(count), file=stderr)
+    finally:
+        PLAYLIST.close()
+        if overlay is not None:
+            overlay.clear(SINKS)
+        for sink in SINKS:
+            sink.close()
+    for sink in SINKS:
+        if isinstance(sink, AdaptiveSink) and any(sink.levels[1:]):
+            print("{0}: frames sent as {1}".format(sink.name, ", ".join(
+                "{0} {1}".format(sent, level)
+                for level, sent in zip(RowEncoder.LEVELS, sink.levels)
+            )), file=stderr)
+        if isinstance(sink, FdSink) and (sink.dropped or sink.max_lag >= SPF):
+            print("{0}: {1} frames dropped, max lag {2:.0f} ms".format(
+                sink.name, sink.dropped, sink.max_lag * 1000), file=stderr)
\ No newline at end of file